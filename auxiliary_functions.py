@@ -1,15 +1,34 @@
 from dataclasses import dataclass, asdict
 from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from sys import intern
 import traceback
-import re
+import mmap
+import os
 
 
 def get_text_from_conllu(filename):
+    """
+    Return the "# text =" lines of a CoNLL-U file, joined with spaces.
+
+    The file is memory-mapped and searched for the marker as bytes, so only
+    the kept lines are decoded.
+    """
     text = []
-    with open(filename, "r", encoding="utf-8") as f:
-        for line in f:
-            if line.startswith("# text ="):
-                text.append(line[8:].strip())
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""  # an empty file cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(b"# text =")
+            while pos != -1:
+                end = mm.find(b"\n", pos)
+                if end == -1:
+                    end = len(mm)
+                if pos == 0 or mm[pos - 1] == ord("\n"):  # only at the start of a line
+                    text.append(mm[pos + 8 : end].decode("utf-8").strip())
+                pos = mm.find(b"# text =", end)
     return " ".join(text)
 
 
@@ -21,7 +40,7 @@ def extract_words_from_conllu(path):
     A line is considered a word annotation if:
     - It is non-empty and not a comment (doesn't start with '#')
     - Splitting on tabs yields either 8 or 10 fields (CoNLL-U uses 10 fields, some variants use 8)
-    - The first field can be converted to an integer (this excludes multiword tokens like "1-2" and empty nodes like "1.1")
+    - The first field consists only of digits (this excludes multiword tokens like "1-2" and empty nodes like "1.1")
 
     Returns:
         words (list of str): the extracted FORM values, in file order.
@@ -37,18 +56,16 @@ def extract_words_from_conllu(path):
             parts = line.split("\t")
             if len(parts) not in (8, 10):
                 continue  # not a standard word-annotation line
-            # Check first field is an integer (true word lines)
-            try:
-                _ = int(parts[0])
-            except ValueError:
-                # skip multiword tokens like "1-2" or empty-node IDs like "1.1"
+            # Check first field is an integer (true word lines); this skips
+            # multiword tokens like "1-2" and empty-node IDs like "1.1"
+            if not parts[0].isdigit():
                 continue
             # Append the FORM (second field, index 1)
             words.append(parts[1])
     return words
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     sent_id: str
     index: int
@@ -71,60 +88,101 @@ class Token:
         self.head = int(self.head)
 
 
+METADATA_KEYS = {
+    "# text =": "text",
+    "# translation =": "translation",
+    "# translation_en =": "translation_en",
+    "# newdoc id =": "title",
+    "# sent_id =": "sent_id",
+}
+
+
 def buildTokenList(myFile):
-    annotation_keys = [
-        "index",
-        "form",
-        "lemma",
-        "upos",
-        "xpos",
-        "feats",
-        "head",
-        "deprel",
-        "deps",
-        "misc",
-    ]
     sentences = []
     for line in myFile:
-        if line.startswith("# text ="):
-            currentToken = {}
-            currentToken["text"] = line.split("=")[1].strip()
-        elif line.startswith("# translation ="):
-            currentToken["translation"] = line.split("=")[1].strip()
-        elif line.startswith("# translation_en ="):
-            currentToken["translation_en"] = line.split("=")[1].strip()
-        elif line.startswith("# newdoc id ="):
-            currentToken["title"] = line.split("=")[1].strip()
-        elif line.startswith("# sent_id ="):
-            currentToken["sent_id"] = line.split("=")[1].strip()
-        elif re.match(r"\d+", line):
-            currentToken.update(dict(zip(annotation_keys, re.split(r"\t+", line))))
-            sentences.append(Token(**currentToken))
+        if line.startswith("#"):
+            for prefix, key in METADATA_KEYS.items():
+                if line.startswith(prefix):
+                    if key == "text":
+                        currentSentence = {}
+                    currentSentence[key] = line.split("=")[1].strip()
+                    metadata = None  # rebuilt at the next word line
+                    break
+        elif line[:1].isdigit():
+            if metadata is None:
+                sent_id = currentSentence.get("sent_id")
+                metadata = tuple(
+                    currentSentence.get(key)
+                    for key in ("text", "translation", "translation_en", "title")
+                )
+            parts = line.rstrip("\n").split("\t")
+            # upos, xpos, deprel and deps take few distinct values: share one
+            # string per value
+            sentences.append(
+                Token(
+                    sent_id,
+                    parts[0],
+                    parts[1],
+                    parts[2],
+                    intern(parts[3]),
+                    intern(parts[4]),
+                    parts[5],
+                    parts[6],
+                    intern(parts[7]),
+                    intern(parts[8]),
+                    parts[9],
+                    *metadata,
+                )
+            )
     return sentences
 
 
+def findHead(tokens, currentToken):
+    """
+    Find the position of a token's head in the token list.
+
+    Tokens of a sentence are stored one after the other, so the head is
+    normally found (head - index) positions away from the current token.
+    If that is not the case (e.g. the list was filtered), fall back to
+    searching the list. Returns None if the head is not in the list.
+    """
+    token = tokens[currentToken]
+    position = currentToken + token.head - token.index
+    if 0 <= position < len(tokens):
+        head = tokens[position]
+        if head.sent_id == token.sent_id and head.index == token.head:
+            return position
+    for position, head in enumerate(tokens):
+        if head.sent_id == token.sent_id and head.index == token.head:
+            return position
+    return None
+
+
 def isClauseHead(tokens, currentToken, clauseHeads):
     """
     Find if a token is a clause head.
 
+    Conjoined and paratactic tokens are clause heads if their head is. The
+    chain of heads is followed with a loop; if it comes back to a token
+    already visited (a cycle in a malformed tree), the token is not a
+    clause head.
+
     Args:
         tokens: list of Token dataclass instances
         currentToken: index of the token whose status we are checking
         clauseHeads: list of dependencies that characterize clause heads
     """
-    if tokens[currentToken].deprel in clauseHeads:
-        return True
-    elif tokens[currentToken].deprel in {"conj", "parataxis"}:
-        sentence = [t for t in tokens if t.sent_id == tokens[currentToken].sent_id]
-        headIndex = tokens[
-            currentToken
-        ].head  # this is the "head" value for the current token
-        newToken = (
-            headIndex - 1
-        )  # this is the corresponding index of the head in the sentence-list
-        return isClauseHead(sentence, newToken, clauseHeads)
-    else:
-        return False
+    visited = set()  # guards against head cycles in malformed trees
+    while currentToken is not None and currentToken not in visited:
+        visited.add(currentToken)
+        if tokens[currentToken].deprel in clauseHeads:
+            return True
+        elif tokens[currentToken].deprel in {"conj", "parataxis"}:
+            # a conjoined or paratactic token is a clause head if its head is
+            currentToken = findHead(tokens, currentToken)
+        else:
+            return False
+    return False
 
 
 def createObservation(tokens, currentToken):
@@ -143,20 +201,45 @@ def createObservation(tokens, currentToken):
         return None
 
 
-def process(fileList, createObservation):
+def processFile(f, createObservation):
+    """
+    Return the list of observations for a single CoNLL-U file.
+    """
+    with open(f, "r", encoding="utf-8") as currentFile:
+        tokens = buildTokenList(currentFile)
+    observations = []
+    for currentToken in range(len(tokens)):
+        newObservation = createObservation(tokens, currentToken)
+        if newObservation:
+            observations.append(newObservation)
+    return observations
+
+
+def process(fileList, createObservation, max_workers=1):
+    """
+    Build the list of observations for a list of CoNLL-U files.
+
+    With max_workers other than 1, the files are processed in parallel by a
+    pool of worker processes (None uses one per CPU). createObservation must
+    then be picklable, i.e. defined at the top level of a module.
+    """
     observations = []  # List of observations
-    for f in fileList:
-        try:
-            with open(f, "r", encoding="utf-8") as currentFile:
-                tokens = buildTokenList(currentFile)
-            for currentToken in range(len(tokens)):
-                newObservation = createObservation(tokens, currentToken)
-                if newObservation:
-                    observations.append(newObservation)
-            print("Processed file: %s" % f)
-        except Exception as e:
-            print(e)
-            traceback.print_exc()
+    with ExitStack() as stack:
+        if max_workers == 1:
+            results = [partial(processFile, f, createObservation) for f in fileList]
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+            results = [
+                executor.submit(processFile, f, createObservation).result
+                for f in fileList
+            ]
+        for f, result in zip(fileList, results):
+            try:
+                observations.extend(result())
+                print("Processed file: %s" % f)
+            except Exception as e:
+                print(e)
+                traceback.print_exc()
 
     return observations
 
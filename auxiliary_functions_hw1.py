@@ -1,10 +1,15 @@
 from dataclasses import dataclass, asdict
+from collections import defaultdict, deque
+from sys import intern
 from typing import Optional
+import numpy as np
 import pandas as pd
+import csv
+import io
 import re
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     sent_id: str
     index: int
@@ -26,31 +31,109 @@ class Token:
         self.index = int(self.index) # coerce to int
         self.head = int(self.head)
 
+METADATA_KEYS = {
+    '# text =': 'text',
+    '# translation =': 'translation',
+    '# translation_en =': 'translation_en',
+    '# newdoc id =': 'title',
+    '# sent_id =': 'sent_id',
+}
+ANNOTATION_KEYS = ['index', 'form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc']
+# upos, xpos and deprel only take a few dozen values, so they are stored as categoricals
+ANNOTATION_DTYPES = {
+    'index': 'int32', 'form': str, 'lemma': str, 'upos': 'category', 'xpos': 'category',
+    'feats': str, 'head': 'int32', 'deprel': 'category', 'deps': str, 'misc': str,
+}
+_WORD_LINE = re.compile(r'\d+\t')
+
 def buildTokenList(myFile):
-    annotation_keys = ['index', 'form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc']
     sentences = []
     for line in myFile:
-        if line.startswith('# text ='):
-            currentToken = {}
-            currentToken['text'] = line.split('=')[1].strip()
-        elif line.startswith('# translation ='):
-            currentToken['translation'] = line.split('=')[1].strip()
-        elif line.startswith('# translation_en ='):
-            currentToken['translation_en'] = line.split('=')[1].strip()
-        elif line.startswith('# newdoc id ='):
-            currentToken['title'] = line.split('=')[1].strip()
-        elif line.startswith('# sent_id ='):
-            currentToken['sent_id'] = line.split('=')[1].strip()
-        elif re.match(r'\d+', line):
-            currentToken.update(dict(zip(annotation_keys, re.split(r'\t+', line))))
-            sentences.append(Token(**currentToken))
+        if line.startswith('#'):
+            for prefix, key in METADATA_KEYS.items():
+                if line.startswith(prefix):
+                    if key == 'text':
+                        currentSentence = {}
+                    currentSentence[key] = line.split('=')[1].strip()
+                    metadata = None  # rebuilt at the next word line
+                    break
+        elif line[:1].isdigit():
+            if metadata is None:
+                sent_id = currentSentence.get('sent_id')
+                metadata = tuple(currentSentence.get(key) for key in ('text', 'translation', 'translation_en', 'title'))
+            parts = line.rstrip('\n').split('\t')
+            # upos, xpos, deprel and deps take few distinct values: share one string per value
+            sentences.append(Token(sent_id, parts[0], parts[1], parts[2], intern(parts[3]), intern(parts[4]),
+                                   parts[5], parts[6], intern(parts[7]), intern(parts[8]), parts[9], *metadata))
     return sentences
 
-_TREE = {"df": None, "groups": None, "sent_col": None}
+def buildTokenDf(myFile):
+    """
+    Read a CoNLL-U file into a DataFrame with one row per word.
 
-def init_tree_viewer(tokens_df, sent_col=None):
+    Comment lines are collected in a single pass and the word lines are handed
+    to the C parser of pd.read_csv in one go; the sentence metadata (sent_id,
+    text, translation, translation_en, title) is then repeated over the words
+    of each sentence. The columns are the same as pd.DataFrame(buildTokenList(myFile)).
+    """
+    sentences = []  # one metadata dict per sentence
+    lengths = []    # number of word lines in each sentence
+    buf = io.StringIO()
+    for line in myFile:
+        if line.startswith('#'):
+            for prefix, key in METADATA_KEYS.items():
+                if line.startswith(prefix):
+                    if key == 'text':
+                        sentences.append({})
+                        lengths.append(0)
+                    sentences[-1][key] = line.split('=')[1].strip()
+                    break
+        elif _WORD_LINE.match(line):
+            buf.write(line)
+            lengths[-1] += 1
+
+    if buf.tell():
+        buf.seek(0)
+        words = pd.read_csv(buf, sep='\t', header=None, names=ANNOTATION_KEYS,
+                            dtype=ANNOTATION_DTYPES,
+                            quoting=csv.QUOTE_NONE, engine='c', na_filter=False)
+    else:
+        words = pd.DataFrame({k: pd.Series(dtype=t) for k, t in ANNOTATION_DTYPES.items()})
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    for key in ('sent_id', 'text', 'translation', 'translation_en', 'title'):
+        values = np.array([s.get(key) for s in sentences], dtype=object)
+        words[key] = pd.Series(np.repeat(values, lengths), index=words.index, dtype=object)
+    return words[['sent_id'] + ANNOTATION_KEYS + ['text', 'translation', 'translation_en', 'title']]
+
+_TREE = {"df": None, "columns": None, "rows": None, "sent_col": None,
+         "index_col": None, "head_col": None, "typed": {}}
+
+def _typed_index_head(index_col, head_col):
+    """
+    Return (valid, index, head) arrays for the whole dataframe: index and head
+    converted to integers, and valid marking the rows with a numeric index.
+    Computed once per pair of column names and cached in _TREE["typed"].
+    """
+    key = (index_col, head_col)
+    if key not in _TREE["typed"]:
+        df = _TREE["df"]
+        index = pd.to_numeric(df[index_col], errors="coerce")
+        _TREE["typed"][key] = (
+            index.notna().to_numpy(),
+            index.fillna(0).astype(int).to_numpy(),
+            pd.to_numeric(df[head_col], errors="coerce").fillna(0).astype(int).to_numpy(),
+        )
+    return _TREE["typed"][key]
+
+def init_tree_viewer(tokens_df, sent_col=None, index_col="index", head_col="head"):
     """
     Standard setup. Run this once with your full dataframe.
+
+    The row positions of each sentence are stored, and the index and head
+    columns are converted to integers here if the dataframe has them (other
+    column names are converted the first time print_clause uses them), so
+    that print_clause only has to slice NumPy arrays.
     """
     global _TREE
 
@@ -66,70 +149,77 @@ def init_tree_viewer(tokens_df, sent_col=None):
     df["_sent_key"] = df[sent_col].astype(str)
 
     _TREE["df"] = df
-    _TREE["groups"] = df.groupby("_sent_key", sort=False)
+    _TREE["columns"] = {col: df[col].to_numpy() for col in df.columns}
+    _TREE["rows"] = df.groupby("_sent_key", sort=False).indices
     _TREE["sent_col"] = sent_col
+    _TREE["index_col"] = index_col
+    _TREE["head_col"] = head_col
+    _TREE["typed"] = {}
+    if index_col in df.columns and head_col in df.columns:
+        _typed_index_head(index_col, head_col)
 
 def print_clause(sent_id, head_index,
                  index_col="index", head_col="head", form_col="form",
                  upos_col="upos", deprel_col="deprel"):
     """
     Prints the clause headed by `head_index` in `sent_id` with full sentence metadata.
-    The output is sorted by token index (linear order).
+    The output is sorted by token index (linear order). The integer versions of
+    `index_col` and `head_col` are computed once per pair of column names and
+    reused by later calls.
     """
-    if _TREE["groups"] is None:
+    if _TREE["rows"] is None:
         raise RuntimeError("Run init_tree_viewer(tokensDf) once first.")
 
     # 1. Retrieve the sentence
     key = str(sent_id)
-    try:
-        s = _TREE["groups"].get_group(key).copy()
-    except KeyError:
+    rows = _TREE["rows"].get(key)
+    if rows is None:
         # Fallback logic for int/float ID mismatch
         alts = [str(float(sent_id)), str(int(float(sent_id)))] if str(sent_id).replace('.', '').isdigit() else []
         for k2 in alts:
-            if k2 in _TREE["groups"].groups:
-                s = _TREE["groups"].get_group(k2).copy()
+            if k2 in _TREE["rows"]:
+                rows = _TREE["rows"][k2]
                 break
         else:
             print(f"Sentence ID {sent_id} not found.")
             return
+    columns = _TREE["columns"]
 
     start_node = int(head_index)
     
     # --- METADATA PRINTING ---
     print(f"Sentence: {sent_id} | Clause Head: {start_node}")
-    if "text" in s.columns:
-         print(f"Text:       {s['text'].iloc[0]}")
-    if "translation" in s.columns:
-        print(f"Mod. Fr.:   {s['translation'].iloc[0]}")
-    if "translation_en" in s.columns:
-        print(f"English:    {s['translation_en'].iloc[0]}")
+    if "text" in columns:
+         print(f"Text:       {columns['text'][rows[0]]}")
+    if "translation" in columns:
+        print(f"Mod. Fr.:   {columns['translation'][rows[0]]}")
+    if "translation_en" in columns:
+        print(f"English:    {columns['translation_en'][rows[0]]}")
     print("-" * 40)
 
-    # 2. Data Cleaning
-    s = s[pd.to_numeric(s[index_col], errors="coerce").notna()].copy()
-    s[index_col] = s[index_col].astype(int)
-    s[head_col] = pd.to_numeric(s[head_col], errors="coerce").fillna(0).astype(int)
+    # 2. Index and head columns, converted to integers once (rows without a
+    # numeric index are skipped)
+    valid, index, heads = _typed_index_head(index_col, head_col)
+    rows = rows[valid[rows]]
+    index = index[rows]
+    heads = heads[rows]
 
     # 3. Build Adjacency List for Traversal
-    children = {}
-    for _, r in s.iterrows():
-        h = r[head_col]
-        i = r[index_col]
-        if h not in children: children[h] = []
+    children = defaultdict(list)
+    for i, h in zip(index.tolist(), heads.tolist()):
         children[h].append(i)
 
     # 4. Find Transitive Closure (All descendants of head_index)
     # Check if head exists
-    if start_node not in s[index_col].values:
+    if start_node not in index:
         print(f"Error: Head index {start_node} not found in sentence {sent_id}.")
         return
 
     subtree_indices = {start_node}
-    queue = [start_node]
+    queue = deque([start_node])
 
     while queue:
-        curr = queue.pop(0)
+        curr = queue.popleft()
         if curr in children:
             for child in children[curr]:
                 if child not in subtree_indices:
@@ -137,24 +227,25 @@ def print_clause(sent_id, head_index,
                     queue.append(child)
 
     # 5. Filter and Sort by Linear Index
-    clause_df = s[s[index_col].isin(subtree_indices)].copy()
-    clause_df.sort_values(by=index_col, inplace=True)
+    in_clause = np.flatnonzero(np.isin(index, list(subtree_indices)))
+    order = in_clause[np.argsort(index[in_clause], kind="stable")]
+    clause_rows = rows[order]
 
     # 6. Print Output
     # Reconstruct readable text of just the clause
-    tokens = clause_df[form_col].astype(str).tolist()
+    tokens = [str(form) for form in columns[form_col][clause_rows]]
     print(f"Clause Text: \"{' '.join(tokens)}\"")
     print("-" * 40)
 
     # Print detailed tokens
-    for _, r in clause_df.iterrows():
-        i = r[index_col]
-        form = r[form_col]
-        upos = r.get(upos_col, "_")
-        dep = r.get(deprel_col, "_")
-        head = r.get(head_col, "_")
-        
+    missing = np.full(len(clause_rows), "_", dtype=object)
+    for i, form, upos, dep, head in zip(
+        index[order],
+        columns[form_col][clause_rows],
+        columns[upos_col][clause_rows] if upos_col in columns else missing,
+        columns[deprel_col][clause_rows] if deprel_col in columns else missing,
+        heads[order],
+    ):
         # Mark the head visually
         marker = " (HEAD)" if i == start_node else ""
         print(f"{i}: {form}/{upos}/{head} [{dep}]{marker}")
-
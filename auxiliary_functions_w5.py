@@ -1,15 +1,37 @@
 from dataclasses import dataclass, asdict
 from typing import Optional, List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 import traceback
+import mmap
+import os
+import numpy as np
 import pandas as pd
+import csv
+import io
 import re
 
 def get_text_from_conllu(filename):
+    """
+    Return the "# text =" lines of a CoNLL-U file, joined with spaces.
+
+    The file is memory-mapped and searched for the marker as bytes, so only
+    the kept lines are decoded.
+    """
     text = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.startswith('# text ='):
-                text.append(line[8:].strip())
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ''  # an empty file cannot be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(b'# text =')
+            while pos != -1:
+                end = mm.find(b'\n', pos)
+                if end == -1:
+                    end = len(mm)
+                if pos == 0 or mm[pos - 1] == ord('\n'):  # only at the start of a line
+                    text.append(mm[pos + 8:end].decode('utf-8').strip())
+                pos = mm.find(b'# text =', end)
     return ' '.join(text)
 
 def extract_words_from_conllu(path):
@@ -20,7 +42,7 @@ def extract_words_from_conllu(path):
     A line is considered a word annotation if:
     - It is non-empty and not a comment (doesn't start with '#')
     - Splitting on tabs yields either 8 or 10 fields (CoNLL-U uses 10 fields, some variants use 8)
-    - The first field can be converted to an integer (this excludes multiword tokens like "1-2" and empty nodes like "1.1")
+    - The first field consists only of digits (this excludes multiword tokens like "1-2" and empty nodes like "1.1")
 
     Returns:
         words (list of str): the extracted FORM values, in file order.
@@ -36,17 +58,15 @@ def extract_words_from_conllu(path):
             parts = line.split("\t")
             if len(parts) not in (8, 10):
                 continue  # not a standard word-annotation line
-            # Check first field is an integer (true word lines)
-            try:
-                _ = int(parts[0])
-            except ValueError:
-                # skip multiword tokens like "1-2" or empty-node IDs like "1.1"
+            # Check first field is an integer (true word lines); this skips
+            # multiword tokens like "1-2" and empty-node IDs like "1.1"
+            if not parts[0].isdigit():
                 continue
             # Append the FORM (second field, index 1)
             words.append(parts[1])
     return words
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     sent_id: str
     index: int
@@ -68,44 +88,195 @@ class Token:
         self.index = int(self.index) # coerce to int
         self.head = int(self.head)
 
-def buildTokenList(myFile):
-    annotation_keys = ['index', 'form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc']
-    sentences = []
+ANNOTATION_KEYS = ['index', 'form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc']
+METADATA_KEYS = {
+    '# text =': 'text',
+    '# translation =': 'translation',
+    '# translation_en =': 'translation_en',
+    '# newdoc id =': 'title',
+    '# sent_id =': 'sent_id',
+}
+# upos, xpos and deprel only take a few dozen values, so they are stored as categoricals
+ANNOTATION_DTYPES = {
+    'index': 'int32', 'form': str, 'lemma': str, 'upos': 'category', 'xpos': 'category',
+    'feats': str, 'head': 'int32', 'deprel': 'category', 'deps': str, 'misc': str,
+}
+_WORD_LINE = re.compile(r'\d+\t')
+
+def buildTokenDf(myFile):
+    """
+    Read a CoNLL-U file into a DataFrame with one row per word.
+
+    Comment lines are collected in a single pass and the word lines are handed
+    to the C parser of pd.read_csv in one go; the sentence metadata (sent_id,
+    text, translation, translation_en, title) is then repeated over the words
+    of each sentence. The columns are the same as pd.DataFrame(buildTokenList(myFile)).
+    """
+    sentences = []  # one metadata dict per sentence
+    lengths = []    # number of word lines in each sentence
+    buf = io.StringIO()
     for line in myFile:
-        if line.startswith('# text ='):
-            currentToken = {}
-            currentToken['text'] = line.split('=')[1].strip()
-        elif line.startswith('# translation ='):
-            currentToken['translation'] = line.split('=')[1].strip()
-        elif line.startswith('# translation_en ='):
-            currentToken['translation_en'] = line.split('=')[1].strip()
-        elif line.startswith('# newdoc id ='):
-            currentToken['title'] = line.split('=')[1].strip()
-        elif line.startswith('# sent_id ='):
-            currentToken['sent_id'] = line.split('=')[1].strip()
-        elif re.match(r'\d+', line):
-            currentToken.update(dict(zip(annotation_keys, re.split(r'\t+', line))))
-            sentences.append(Token(**currentToken))
-    return sentences
+        if line.startswith('#'):
+            for prefix, key in METADATA_KEYS.items():
+                if line.startswith(prefix):
+                    if key == 'text':
+                        sentences.append({})
+                        lengths.append(0)
+                    sentences[-1][key] = line.split('=')[1].strip()
+                    break
+        elif _WORD_LINE.match(line):
+            buf.write(line)
+            lengths[-1] += 1
+
+    if buf.tell():
+        buf.seek(0)
+        words = pd.read_csv(buf, sep='\t', header=None, names=ANNOTATION_KEYS,
+                            dtype=ANNOTATION_DTYPES,
+                            quoting=csv.QUOTE_NONE, engine='c', na_filter=False)
+    else:
+        words = pd.DataFrame({k: pd.Series(dtype=t) for k, t in ANNOTATION_DTYPES.items()})
+
+    lengths = np.asarray(lengths, dtype=np.int64)
+    for key in ('sent_id', 'text', 'translation', 'translation_en', 'title'):
+        values = np.array([s.get(key) for s in sentences], dtype=object)
+        words[key] = pd.Series(np.repeat(values, lengths), index=words.index, dtype=object)
+    return words[['sent_id'] + ANNOTATION_KEYS + ['text', 'translation', 'translation_en', 'title']]
+
+def buildTokenList(myFile):
+    return [Token(*row) for row in buildTokenDf(myFile).itertuples(index=False, name=None)]
+
+def findHeadPositions(tokensDf):
+    """
+    Return the row position of each token's head in tokensDf, found once by
+    matching (sent_id, head) against (sent_id, index), and a boolean array
+    telling whether the head was found (roots and dangling heads are not).
+    """
+    own_keys = pd.MultiIndex.from_arrays([tokensDf["sent_id"], tokensDf["index"]])
+    head_keys = pd.MultiIndex.from_arrays([tokensDf["sent_id"], tokensDf["head"]])
+    valid = (tokensDf["index"].notna() & (tokensDf["index"] != 0)).to_numpy()
+
+    first = ~own_keys.duplicated()
+    found = own_keys[first].get_indexer(head_keys)  # -1 if the head is not in tokensDf
+    head_pos = np.where(found != -1, np.flatnonzero(first)[found], 0)
+    return head_pos, (found != -1) & valid[head_pos]
+
+def clauseHeadMask(tokensDf, clauseHeads, propagate_rels=("conj", "parataxis"), headPositions=None):
+    """
+    Return a boolean array marking the rows of tokensDf that head a clause.
+
+    A token is kept if its deprel is in clauseHeads, or if its deprel is in
+    propagate_rels and its head (in the same sentence) is kept. The second
+    rule is applied on NumPy arrays until no new rows are added.
+    headPositions is the result of findHeadPositions(tokensDf), if already known.
+    """
+    head_pos, has_head = headPositions if headPositions is not None else findHeadPositions(tokensDf)
+    keep = tokensDf["deprel"].isin(clauseHeads).to_numpy(copy=True)
+    propagate = tokensDf["deprel"].isin(propagate_rels).to_numpy() & has_head
+
+    while True:
+        new = propagate & ~keep & keep[head_pos]
+        if not new.any():
+            break
+        keep |= new
+    return keep
 
 def filterClauseHeads(tokensDf, clauseHeads, propagate_rels=("conj", "parataxis")):
-    def per_sentence(g):
-        keep_ids = set(g.loc[g["deprel"].isin(clauseHeads), "index"].dropna())
-        keep_ids.discard(0)
-
-        while True:
-            old_size = len(keep_ids)
-            mask = g["deprel"].isin(propagate_rels) & g["head"].isin(keep_ids)
-            keep_ids.update(g.loc[mask, "index"].dropna().tolist())
-            if len(keep_ids) == old_size:
-                break
-
-        keep_mask = g["deprel"].isin(clauseHeads) | g["index"].isin(keep_ids)
-        return g.loc[keep_mask]
-
-    return (
-        tokensDf
-        .groupby("sent_id", sort=False, group_keys=False)
-        .apply(per_sentence)
-        .copy()
-    )
+    """
+    Keep the rows of tokensDf that head a clause (see clauseHeadMask).
+    """
+    return tokensDf[clauseHeadMask(tokensDf, clauseHeads, propagate_rels)].copy()
+
+CLAUSE_TYPES = {
+    "root": "root",
+    "conj": "conjoined",
+    "parataxis": "parataxis",
+    "csubj": "subject",
+    "advcl": "adverbial",
+    "acl": "relative",
+    "ccomp": "complement",
+    "xcomp": "complement",
+}
+
+def createObservation(tokensDf, clauseHeads=("root", "advcl", "acl", "csubj", "ccomp", "xcomp")):
+    """
+    Build one observation per clause head, with the type and position of its
+    subject, in the format of SubjectsFrame.csv.
+
+    The head positions are computed once and used both to find the clause
+    heads and to attach each subject (nsubj or csubj dependent) to its head;
+    the result is then built directly from the selected rows. If a clause
+    head has several subjects, the first one is used; clauses whose subject
+    is clausal (csubj) are left out.
+
+    Returns:
+        A DataFrame with columns sent_id, form, clauseType (see CLAUSE_TYPES),
+        subjectType ('nominal subject' or 'null subject'), subjectPosition
+        ('pre-verbal', 'post-verbal' or 'null subject'), title, text and
+        translation.
+    """
+    head_pos, has_head = findHeadPositions(tokensDf)
+    rows = np.flatnonzero(clauseHeadMask(tokensDf, clauseHeads, headPositions=(head_pos, has_head)))
+
+    # row of the first subject of each token, -1 if it has none
+    subject_rows = np.flatnonzero(tokensDf["deprel"].isin(["nsubj", "csubj"]).to_numpy() & has_head)
+    heads_with_subject, first = np.unique(head_pos[subject_rows], return_index=True)
+    subject = np.full(len(tokensDf), -1)
+    subject[heads_with_subject] = subject_rows[first]
+    subject = subject[rows]
+
+    deprel = tokensDf["deprel"].to_numpy()
+    subjectDeprel = np.where(subject != -1, deprel[subject], None)
+    nominal = subjectDeprel == "nsubj"
+    clausal = subjectDeprel == "csubj"
+    rows, subject, nominal = rows[~clausal], subject[~clausal], nominal[~clausal]
+
+    index = tokensDf["index"].to_numpy()
+    subjectIndex = index[subject]
+    return pd.DataFrame({
+        "sent_id": tokensDf["sent_id"].to_numpy()[rows],
+        "form": tokensDf["form"].to_numpy()[rows],
+        "clauseType": [CLAUSE_TYPES.get(d, d) for d in deprel[rows]],
+        "subjectType": np.where(nominal, "nominal subject", "null subject"),
+        "subjectPosition": np.select(
+            [~nominal, subjectIndex < index[rows], subjectIndex > index[rows]],
+            ["null subject", "pre-verbal", "post-verbal"], default="null subject"
+        ),
+        "title": tokensDf["title"].to_numpy()[rows],
+        "text": tokensDf["text"].to_numpy()[rows],
+        "translation": tokensDf["translation"].to_numpy()[rows],
+    })
+
+def processFile(f, createObservation=createObservation):
+    """
+    Return the observations DataFrame for a single CoNLL-U file.
+    """
+    with open(f, 'r', encoding='utf-8') as currentFile:
+        tokensDF = buildTokenDf(currentFile)
+    return createObservation(tokensDF)
+
+def process(fileList, createObservation=createObservation, max_workers=1):
+    """
+    Build the observations DataFrame for a list of CoNLL-U files.
+
+    The per-file DataFrames are collected in a list and concatenated once at
+    the end, rather than growing a DataFrame inside the loop. With max_workers
+    other than 1, the files are processed in parallel by a pool of worker
+    processes (None uses one per CPU); createObservation must then be
+    picklable, i.e. defined at the top level of a module.
+    """
+    frames = []
+    with ExitStack() as stack:
+        if max_workers == 1:
+            results = [partial(processFile, f, createObservation) for f in fileList]
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+            results = [executor.submit(processFile, f, createObservation).result for f in fileList]
+        for f, result in zip(fileList, results):
+            try:
+                frames.append(result())
+                print("Processed file: %s" % f)
+            except Exception as e:
+                print(e)
+                traceback.print_exc()
+
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()